@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tasks.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -137,4 +138,32 @@ REST_FRAMEWORK = {
 
 # Sync config
 SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "50"))
-MAX_RETRY = int(os.getenv("MAX_RETRY", "3"))
\ No newline at end of file
+MAX_RETRY = int(os.getenv("MAX_RETRY", "3"))
+# worker threads for POST /api/sync (1 = process the batch serially)
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "1"))
+# queue partitions for manage.py sync_consumer; changing it requires re-deriving
+# SyncQueueItem.partition for pending items
+SYNC_PARTITIONS = int(os.getenv("SYNC_PARTITIONS", "16"))
+# seconds a consumer heartbeat / partition lease stays valid without renewal
+SYNC_CONSUMER_TTL = int(os.getenv("SYNC_CONSUMER_TTL", "30"))
+
+# Change notifications: "inprocess" (single process) or "postgres" (LISTEN/NOTIFY across processes)
+NOTIFY_BACKEND = os.getenv("NOTIFY_BACKEND", "inprocess")
+NOTIFY_LONGPOLL_TIMEOUT = float(os.getenv("NOTIFY_LONGPOLL_TIMEOUT", "25"))
+
+# Group commit for task mutations: 0 disables it (each request commits on its own)
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "0"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "100"))
+# seconds a request waits for its mutation to start; one still queued then is cancelled (503)
+GROUP_COMMIT_TIMEOUT = float(os.getenv("GROUP_COMMIT_TIMEOUT", "30"))
+
+# Tombstone GC (manage.py gc_tombstones): soft-deleted tasks older than the horizon are removed.
+# The minimum keeps deletes visible long enough for delta-syncing clients to pick them up.
+TOMBSTONE_HORIZON_DAYS = int(os.getenv("TOMBSTONE_HORIZON_DAYS", "30"))
+TOMBSTONE_MIN_HORIZON_DAYS = int(os.getenv("TOMBSTONE_MIN_HORIZON_DAYS", "7"))
+
+# Request profiling (tasks.profiling): requests with a valid X-Profile-Token header
+# (manage.py profiles token) or a random PROFILE_SAMPLE_RATE share are captured to PROFILE_DIR
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", BASE_DIR / "profiles"))
+PROFILE_TOKEN_MAX_AGE = int(os.getenv("PROFILE_TOKEN_MAX_AGE", "3600"))
\ No newline at end of file
@@ -0,0 +1,36 @@
+"""
+API-only runtime profile for task_sync_api.
+
+The service only speaks JSON, so this drops admin, sessions, messages, CSRF,
+clickjacking and template machinery from the default settings. Use it with:
+
+    DJANGO_SETTINGS_MODULE=task_sync_api.settings_api
+
+/admin/ is not routed under this profile.
+"""
+
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    "tasks",
+]
+
+MIDDLEWARE = [
+    'tasks.profiling.ProfilingMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+TEMPLATES = []
+
+AUTH_PASSWORD_VALIDATORS = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    # no auth app: every request is anonymous and no user model is loaded
+    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
+    'UNAUTHENTICATED_USER': None,
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+    'DEFAULT_PARSER_CLASSES': ['rest_framework.parsers.JSONParser'],
+}
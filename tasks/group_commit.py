@@ -0,0 +1,163 @@
+"""
+Optional group-commit write path for task mutations.
+
+With GROUP_COMMIT_WINDOW_MS > 0, request threads hand their mutation to a single
+flusher thread instead of writing in autocommit. The flusher collects whatever
+arrives within the window (up to GROUP_COMMIT_MAX_BATCH), runs each mutation in
+its own savepoint inside one transaction, bulk-inserts the queued SyncQueueItems
+and commits once. Every caller blocks until that shared commit and then gets its
+own result (or its own exception).
+
+A caller waits at most GROUP_COMMIT_TIMEOUT seconds for its mutation to start.
+If it has not started by then it is cancelled and the caller gets
+GroupCommitTimeout, so a 503 always means nothing was written. A mutation that is
+already being flushed is waited for, and the caller gets its real outcome.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from .models import SyncQueueItem
+from . import services
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class GroupCommitTimeout(Exception):
+    """The mutation did not start within GROUP_COMMIT_TIMEOUT and was cancelled; nothing was written."""
+
+
+_STOP = object()
+
+
+class GroupCommitter:
+    def __init__(self, window: float, max_batch: int, timeout=None):
+        self.window = window
+        self.max_batch = max_batch
+        self.timeout = timeout if timeout is not None else getattr(settings, "GROUP_COMMIT_TIMEOUT", 30.0)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        self._ensure_thread()
+        fut = Future()
+        self._queue.put((fn, args, kwargs, fut))
+        try:
+            return fut.result(timeout=self.timeout)
+        except FutureTimeout:
+            # cancelled futures are skipped by the flusher, so nothing of this one is written
+            if fut.cancel():
+                raise GroupCommitTimeout(f"mutation not started within {self.timeout}s")
+        # already being flushed: it may commit, so report what really happened
+        # (the flusher completes every future it started, with a result or an exception)
+        return fut.result()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="task-group-commit", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def stop(self):
+        """Flush what is queued, close the flusher's DB connection and end its thread."""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _run(self):
+        while True:
+            batch, stopping = [], False
+            try:
+                batch = self._collect()
+                stopping = _STOP in batch
+                batch = [entry for entry in batch if entry is not _STOP]
+                close_old_connections()
+                self._flush(batch)
+            except Exception as ex:
+                # keep the flusher alive: fail only this batch's callers and move on
+                logger.exception(f"Group commit flusher error: {ex}")
+                for _, _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(ex)
+            if stopping:
+                connections.close_all()
+                return
+
+    def _flush(self, batch):
+        # callers that already timed out cancelled their future; drop those mutations
+        batch = [entry for entry in batch if entry[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        results = []
+        try:
+            with transaction.atomic():
+                queued = []
+                for fn, args, kwargs, fut in batch:
+                    services._group_buffer.items = []
+                    try:
+                        # savepoint: one bad mutation must not sink the rest of the group
+                        with transaction.atomic():
+                            value = fn(*args, **kwargs)
+                    except Exception as ex:
+                        results.append((fut, None, ex))
+                        continue
+                    queued.extend(services._group_buffer.items)
+                    results.append((fut, value, None))
+                services._group_buffer.items = None
+                SyncQueueItem.objects.bulk_create(queued)
+        except Exception as ex:
+            logger.exception(f"Group commit of {len(batch)} mutations failed: {ex}")
+            for _, _, _, fut in batch:
+                fut.set_exception(ex)
+            return
+        finally:
+            services._group_buffer.items = None
+
+        for fut, value, ex in results:
+            if ex is not None:
+                fut.set_exception(ex)
+            else:
+                fut.set_result(value)
+
+
+_committer = None
+_committer_lock = threading.Lock()
+
+
+def _get_committer():
+    global _committer
+    if _committer is None:
+        with _committer_lock:
+            if _committer is None:
+                _committer = GroupCommitter(
+                    settings.GROUP_COMMIT_WINDOW_MS / 1000.0,
+                    settings.GROUP_COMMIT_MAX_BATCH,
+                )
+    return _committer
+
+
+def run(fn, *args, **kwargs):
+    """Run a task mutation, through the shared group commit when it is enabled."""
+    if getattr(settings, "GROUP_COMMIT_WINDOW_MS", 0) <= 0:
+        return fn(*args, **kwargs)
+    return _get_committer().submit(fn, *args, **kwargs)
@@ -0,0 +1,63 @@
+import random
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import connections
+from tasks.models import Task, VersionConflict
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent writers on shared tasks: compare-and-swap vs unchecked read-modify-write"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--ops", type=int, default=200, help="successful writes per writer")
+        parser.add_argument("--tasks", type=int, default=10, help="shared tasks (fewer = more contention)")
+
+    def _run(self, mode, writers, ops, ids):
+        counts = {"writes": 0, "conflicts": 0}
+        lock = threading.Lock()
+
+        def writer(seed):
+            rng = random.Random(seed)
+            writes = conflicts = 0
+            try:
+                while writes < ops:
+                    task = Task.objects.get(id=rng.choice(ids))
+                    task.title = f"w{seed}-{writes}"
+                    if mode == "cas":
+                        try:
+                            task.save()
+                        except VersionConflict:
+                            conflicts += 1
+                            continue
+                    else:
+                        # what a plain save did before versions: nothing stops a lost update
+                        Task.objects.filter(id=task.id).update(title=task.title, version=task.version + 1)
+                    writes += 1
+            finally:
+                connections.close_all()
+            with lock:
+                counts["writes"] += writes
+                counts["conflicts"] += conflicts
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        applied = sum(v - 1 for v in Task.objects.filter(id__in=ids).values_list("version", flat=True))
+        return counts["writes"] / elapsed, counts["conflicts"], counts["writes"] - applied
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"{'mode':<10} {'writes/s':>9} {'conflicts':>10} {'lost updates':>13}")
+        for mode in ("unchecked", "cas"):
+            ids = [t.id for t in Task.objects.bulk_create([Task(title="bench") for _ in range(opts["tasks"])])]
+            try:
+                rate, conflicts, lost = self._run(mode, opts["writers"], opts["ops"], ids)
+            finally:
+                Task.objects.filter(id__in=ids).delete()
+            self.stdout.write(f"{mode:<10} {rate:>9.1f} {conflicts:>10} {lost:>13}")
@@ -0,0 +1,66 @@
+import statistics
+import threading
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db import connections
+from tasks.models import Task, SyncQueueItem
+from tasks import services
+from tasks.group_commit import GroupCommitter
+
+
+class Command(BaseCommand):
+    help = "Benchmark task-create throughput and latency with and without group commit"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=16, help="concurrent writer threads")
+        parser.add_argument("--ops", type=int, default=100, help="creates per writer")
+        parser.add_argument("--windows", default="0,1,2,5,10",
+                            help="comma separated group-commit windows in ms (0 = autocommit)")
+        parser.add_argument("--max-batch", type=int, default=100)
+
+    def _run(self, window_ms, clients, ops, max_batch):
+        committer = GroupCommitter(window_ms / 1000.0, max_batch) if window_ms > 0 else None
+        latencies, ids = [], []
+        lock = threading.Lock()
+
+        def writer():
+            mine, my_ids = [], []
+            try:
+                for _ in range(ops):
+                    data = {"id": str(uuid.uuid4()), "title": "bench"}
+                    t0 = time.perf_counter()
+                    if committer:
+                        committer.submit(services.create_task, data)
+                    else:
+                        services.create_task(data)
+                    mine.append(time.perf_counter() - t0)
+                    my_ids.append(data["id"])
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(mine)
+                ids.extend(my_ids)
+
+        threads = [threading.Thread(target=writer) for _ in range(clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        if committer:
+            committer.stop()
+
+        SyncQueueItem.objects.filter(task_id__in=ids).delete()
+        Task.objects.filter(id__in=ids).delete()
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+        return len(latencies) / elapsed, statistics.median(latencies or [0.0]), p99
+
+    def handle(self, *args, **opts):
+        windows = [float(w) for w in opts["windows"].split(",") if w.strip()]
+        self.stdout.write(f"{'window ms':>9} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for window in windows:
+            rate, p50, p99 = self._run(window, opts["clients"], opts["ops"], opts["max_batch"])
+            self.stdout.write(f"{window:>9g} {rate:>9.1f} {p50 * 1000:>8.2f} {p99 * 1000:>8.2f}")
@@ -0,0 +1,57 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter per sample so import and setup costs are really cold.
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+import tasks.views
+startup = time.perf_counter() - t0
+
+from django.test import Client
+client = Client(HTTP_HOST=sys.argv[2])
+n = int(sys.argv[1])
+client.get('/api/health/')
+t0 = time.perf_counter()
+for _ in range(n):
+    client.get('/api/health/')
+per_request = (time.perf_counter() - t0) / n if n else 0.0
+print(json.dumps({"startup": startup, "per_request": per_request}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Compare cold-start time and per-request overhead between settings profiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", default="task_sync_api.settings,task_sync_api.settings_api",
+                            help="comma separated settings modules to compare")
+        parser.add_argument("--runs", type=int, default=5, help="cold starts per profile")
+        parser.add_argument("--requests", type=int, default=1000,
+                            help="GET /api/health/ calls per run (no DB access)")
+
+    def _sample(self, module, n_requests):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": module}
+        host = settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else "localhost"
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE, str(n_requests), host],
+            env=env, cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        )
+        return json.loads(out.stdout.strip().splitlines()[-1])
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"{'profile':<32} {'startup ms':>11} {'request us':>11}")
+        for module in [p.strip() for p in opts["profiles"].split(",") if p.strip()]:
+            samples = [self._sample(module, opts["requests"]) for _ in range(opts["runs"])]
+            startup = statistics.median(s["startup"] for s in samples) * 1000
+            per_request = statistics.median(s["per_request"] for s in samples) * 1e6
+            self.stdout.write(f"{module:<32} {startup:>11.1f} {per_request:>11.1f}")
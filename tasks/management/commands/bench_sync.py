@@ -0,0 +1,54 @@
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from tasks.models import Task, SyncQueueItem
+from tasks import services
+
+
+class Command(BaseCommand):
+    help = "Benchmark sync queue throughput for serial vs parallel (sharded) processing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=1000, help="queue items per run")
+        parser.add_argument("--tasks", type=int, default=200, help="distinct tasks the items are spread over")
+        parser.add_argument("--workers", default="1,2,4,8", help="comma separated pool sizes to try")
+
+    def _seed(self, n_items, n_tasks):
+        ids = [uuid.uuid4() for _ in range(n_tasks)]
+        now = timezone.now()
+        items = []
+        for i in range(n_items):
+            tid = ids[i % n_tasks]
+            items.append(SyncQueueItem(
+                operation="create" if i < n_tasks else "update",
+                task_id=tid,
+                task_snapshot={
+                    "id": str(tid),
+                    "title": f"bench {i}",
+                    "completed": False,
+                    "updated_at": now.isoformat(),
+                },
+            ))
+        SyncQueueItem.objects.bulk_create(items)
+        return ids, [it.id for it in items]
+
+    def handle(self, *args, **opts):
+        sizes = [int(w) for w in opts["workers"].split(",") if w.strip()]
+        baseline = None
+        self.stdout.write(f"{'workers':>8} {'items':>8} {'seconds':>9} {'items/s':>9} {'speedup':>8}")
+        for workers in sizes:
+            task_ids, item_ids = self._seed(opts["items"], opts["tasks"])
+            try:
+                items = list(SyncQueueItem.objects.filter(id__in=item_ids).order_by("created_at"))
+                start = time.perf_counter()
+                summary = services.process_sync_batch_parallel(items, workers=workers)
+                elapsed = time.perf_counter() - start
+            finally:
+                SyncQueueItem.objects.filter(id__in=item_ids).delete()
+                Task.objects.filter(id__in=task_ids).delete()
+            rate = summary["processed"] / elapsed if elapsed else 0.0
+            if baseline is None:
+                baseline = rate
+            speedup = rate / baseline if baseline else 0.0
+            self.stdout.write(f"{workers:>8} {summary['processed']:>8} {elapsed:>9.3f} {rate:>9.1f} {speedup:>7.2f}x")
@@ -0,0 +1,39 @@
+import json
+import sys
+import time
+from django.core.management.base import BaseCommand
+from tasks.models import Task
+from tasks import services
+
+
+class Command(BaseCommand):
+    help = "Export tasks to a JSONL file, streaming rows through a server-side cursor"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default="-", help="JSONL file to write, or - for stdout")
+        parser.add_argument("--chunk-size", type=int, default=5000,
+                            help="rows fetched per round-trip from the cursor")
+        parser.add_argument("--include-deleted", action="store_true")
+
+    def handle(self, *args, **opts):
+        qs = Task.objects.all() if opts["include_deleted"] else Task.objects.filter(is_deleted=False)
+        # iterator() uses a named (server-side) cursor on Postgres, so memory stays at one chunk
+        rows = qs.order_by().iterator(chunk_size=opts["chunk_size"])
+
+        out = sys.stdout if opts["path"] == "-" else open(opts["path"], "w", encoding="utf-8")
+        total = 0
+        start = time.perf_counter()
+        try:
+            for task in rows:
+                row = services._task_snapshot_from_instance(task)
+                row["sync_status"] = task.sync_status
+                row["last_synced_at"] = task.last_synced_at.isoformat() if task.last_synced_at else None
+                out.write(json.dumps(row) + "\n")
+                total += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+        elapsed = time.perf_counter() - start
+        rate = total / elapsed if elapsed else 0.0
+        self.stderr.write(f"Exported {total} tasks in {elapsed:.2f}s ({rate:.0f} rows/s)")
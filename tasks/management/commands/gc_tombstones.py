@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from tasks import services
+
+
+class Command(BaseCommand):
+    help = "Remove soft-deleted tasks older than the tombstone horizon, with their queue history"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--horizon-days", type=int, default=None,
+                            help="defaults to TOMBSTONE_HORIZON_DAYS; may not be below TOMBSTONE_MIN_HORIZON_DAYS")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="tasks deleted per transaction")
+        parser.add_argument("--archive", help="append removed tasks to this JSONL file before deleting")
+        parser.add_argument("--dry-run", action="store_true", help="only count what would be removed")
+
+    def handle(self, *args, **opts):
+        archive = open(opts["archive"], "a", encoding="utf-8") if opts["archive"] and not opts["dry_run"] else None
+        try:
+            removed = services.collect_tombstones(
+                horizon_days=opts["horizon_days"],
+                chunk_size=opts["chunk_size"],
+                archive=archive,
+                dry_run=opts["dry_run"],
+            )
+        except ValueError as ex:
+            raise CommandError(str(ex))
+        finally:
+            if archive is not None:
+                archive.close()
+
+        verb = "Would remove" if opts["dry_run"] else "Removed"
+        self.stdout.write(f"{verb} {removed['tasks']} tombstoned tasks and {removed['queue_items']} queue items")
@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+import sys
+import time
+import uuid
+from datetime import timezone as dt_timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from tasks.models import Task, SyncQueueItem
+from tasks import services, notifications
+
+COPY_COLUMNS = [
+    "id", "title", "description", "completed", "created_at", "updated_at",
+    "is_deleted", "sync_status", "server_id", "last_synced_at", "version",
+]
+
+
+def _dt(value, default=None):
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"invalid datetime: {value!r}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+def _bool(row, field):
+    value = row.get(field, False)
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    raise ValueError(f"{field} must be a boolean, got {value!r}")
+
+
+def _task_from_row(row: dict, now):
+    if not isinstance(row, dict):
+        raise ValueError(f"expected a JSON object, got {type(row).__name__}")
+    return Task(
+        id=uuid.UUID(row["id"]) if row.get("id") else uuid.uuid4(),
+        title=row.get("title", ""),
+        description=row.get("description", ""),
+        completed=_bool(row, "completed"),
+        created_at=_dt(row.get("created_at"), now),
+        updated_at=_dt(row.get("updated_at"), now),
+        is_deleted=_bool(row, "is_deleted"),
+        sync_status=row.get("sync_status") or "pending",
+        server_id=row.get("server_id"),
+        last_synced_at=_dt(row.get("last_synced_at")),
+        version=int(row.get("version") or 1),
+    )
+
+
+class Command(BaseCommand):
+    help = "Import tasks from a JSONL file (one task object per line) in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="JSONL file to read, or - for stdin")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--enqueue", action="store_true",
+                            help="also create a 'create' SyncQueueItem for every newly inserted task")
+        parser.add_argument("--no-copy", action="store_true",
+                            help="always use bulk_create, even when Postgres COPY is available")
+
+    def _can_copy(self):
+        if connection.vendor != "postgresql":
+            return False
+        with connection.cursor() as cur:
+            return hasattr(cur, "copy_expert")
+
+    def _write_copy(self, tasks):
+        """COPY a chunk in and return the ids that were actually inserted."""
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for t in tasks:
+            row = [getattr(t, c) for c in COPY_COLUMNS]
+            writer.writerow([r"\N" if v is None else (v.isoformat() if hasattr(v, "isoformat") else v) for v in row])
+        buf.seek(0)
+        cols = ", ".join(COPY_COLUMNS)
+        table = Task._meta.db_table
+        with transaction.atomic(), connection.cursor() as cur:
+            # stage through a temp table so existing ids are skipped like bulk_create(ignore_conflicts)
+            cur.execute(f"CREATE TEMP TABLE {table}_import (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+            cur.copy_expert(f"COPY {table}_import ({cols}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buf)
+            cur.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {table}_import "
+                        f"ON CONFLICT (id) DO NOTHING RETURNING id")
+            inserted = {uuid.UUID(str(row[0])) for row in cur.fetchall()}
+            # ON COMMIT DROP does not fire for the savepoint of an outer transaction
+            cur.execute(f"DROP TABLE {table}_import")
+        return inserted
+
+    def _write_bulk(self, tasks):
+        """bulk_create the tasks whose id is not in the table yet and return their ids."""
+        with transaction.atomic():
+            existing = set(Task.objects.filter(id__in=[t.id for t in tasks]).values_list("id", flat=True))
+            fresh, seen = [], set()
+            for t in tasks:
+                # first row wins for ids repeated within the file, as with COPY + ON CONFLICT
+                if t.id not in existing and t.id not in seen:
+                    fresh.append(t)
+                    seen.add(t.id)
+            Task.objects.bulk_create(fresh, ignore_conflicts=True)
+        return seen
+
+    def _flush(self, tasks, use_copy, enqueue):
+        inserted = self._write_copy(tasks) if use_copy else self._write_bulk(tasks)
+        if enqueue:
+            # only rows that were really inserted; a skipped row must not overwrite the existing task on sync
+            queued, done = [], set()
+            for t in tasks:
+                if t.id in inserted and t.id not in done:
+                    queued.append(SyncQueueItem(operation="create", task_id=t.id,
+                                                task_snapshot=services._task_snapshot_from_instance(t)))
+                    done.add(t.id)
+            SyncQueueItem.objects.bulk_create(queued)
+        return len(inserted)
+
+    def handle(self, *args, **opts):
+        chunk_size = opts["chunk_size"]
+        use_copy = not opts["no_copy"] and self._can_copy()
+        stream = sys.stdin if opts["path"] == "-" else open(opts["path"], encoding="utf-8")
+
+        now = timezone.now()
+        chunk, total, inserted = [], 0, 0
+        start = time.perf_counter()
+        try:
+            for lineno, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    chunk.append(_task_from_row(json.loads(line), now))
+                except (ValueError, TypeError) as ex:
+                    raise CommandError(f"line {lineno}: {ex}")
+                if len(chunk) >= chunk_size:
+                    inserted += self._flush(chunk, use_copy, opts["enqueue"])
+                    total += len(chunk)
+                    chunk = []
+                    self.stderr.write(f"{total} rows, {total / (time.perf_counter() - start):.0f} rows/s")
+            if chunk:
+                inserted += self._flush(chunk, use_copy, opts["enqueue"])
+                total += len(chunk)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        elapsed = time.perf_counter() - start
+        if inserted:
+            notifications.publish(notifications.TASKS_CHANGED)
+        rate = total / elapsed if elapsed else 0.0
+        method = "COPY" if use_copy else "bulk_create"
+        self.stdout.write(
+            f"Imported {inserted} of {total} tasks via {method} in {elapsed:.2f}s ({rate:.0f} rows/s); "
+            f"{total - inserted} skipped as already present"
+        )
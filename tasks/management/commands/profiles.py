@@ -0,0 +1,60 @@
+import io
+import json
+import pstats
+from django.core.management.base import BaseCommand, CommandError
+from tasks import profiling
+
+
+class Command(BaseCommand):
+    help = "List and summarize request profiles captured by tasks.profiling, or mint a profiling token"
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["list", "show", "token"])
+        parser.add_argument("profile_id", nargs="?", help="profile to show (default: the latest)")
+        parser.add_argument("--top", type=int, default=20, help="functions / queries to show")
+        parser.add_argument("--sort", default="cumulative", help="pstats sort key for show")
+
+    def _metas(self):
+        metas = []
+        for path in sorted(profiling.profile_dir().glob("*.json")):
+            metas.append(json.loads(path.read_text()))
+        return metas
+
+    def handle(self, *args, **opts):
+        action = opts["action"]
+        if action == "token":
+            self.stdout.write(f"{profiling.HEADER}: {profiling.make_token()}")
+            return
+
+        metas = self._metas()
+        if action == "list":
+            self.stdout.write(f"{'id':<25} {'method':<6} {'status':>6} {'ms':>9} {'sql':>5} {'sql ms':>8}  path")
+            for m in metas:
+                self.stdout.write(
+                    f"{m['id']:<25} {m['method']:<6} {m['status']:>6} {m['duration_ms']:>9.1f} "
+                    f"{m['sql_count']:>5} {m['sql_ms']:>8.1f}  {m['path']}"
+                )
+            return
+
+        if not metas:
+            raise CommandError(f"No profiles in {profiling.profile_dir()}")
+        if opts["profile_id"]:
+            matches = [m for m in metas if m["id"] == opts["profile_id"]]
+            if not matches:
+                raise CommandError(f"Unknown profile {opts['profile_id']}")
+            meta = matches[0]
+        else:
+            meta = metas[-1]
+
+        self.stdout.write(
+            f"{meta['method']} {meta['path']} -> {meta['status']} in {meta['duration_ms']:.1f} ms "
+            f"({meta['sql_count']} queries, {meta['sql_ms']:.1f} ms in SQL)\n"
+        )
+        buf = io.StringIO()
+        stats = pstats.Stats(str(profiling.profile_dir() / f"{meta['id']}.prof"), stream=buf)
+        stats.strip_dirs().sort_stats(opts["sort"]).print_stats(opts["top"])
+        self.stdout.write(buf.getvalue())
+
+        self.stdout.write("Slowest queries:")
+        for q in sorted(meta["queries"], key=lambda q: q["ms"], reverse=True)[:opts["top"]]:
+            self.stdout.write(f"{q['ms']:>9.3f} ms  {q['sql']}")
@@ -0,0 +1,36 @@
+import socket
+import os
+import time
+from django.core.management.base import BaseCommand
+from tasks import partitions
+
+
+class Command(BaseCommand):
+    help = "Run a partitioned sync queue consumer; partitions rebalance as consumers join or leave"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--name", default=None, help="unique consumer name (default: host-pid)")
+        parser.add_argument("--batch-size", type=int, default=None, help="items per partition per step")
+        parser.add_argument("--interval", type=float, default=1.0, help="seconds to sleep when idle")
+        parser.add_argument("--once", action="store_true", help="run a single drain step and exit")
+
+    def handle(self, *args, **opts):
+        name = opts["name"] or f"{socket.gethostname()}-{os.getpid()}"
+        self.stdout.write(f"Consumer {name} started")
+        try:
+            while True:
+                summary = partitions.drain_once(name, opts["batch_size"])
+                if summary["processed"] or summary["failed"]:
+                    self.stdout.write(
+                        f"partitions {summary['partitions']}: "
+                        f"{summary['processed']} processed, {summary['failed']} failed"
+                    )
+                if opts["once"]:
+                    break
+                if not summary["processed"] and not summary["failed"]:
+                    time.sleep(opts["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            partitions.leave(name)
+            self.stdout.write(f"Consumer {name} left")
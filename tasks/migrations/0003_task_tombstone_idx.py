@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_synclog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['is_deleted', 'updated_at'], name='task_tombstone_idx'),
+        ),
+    ]
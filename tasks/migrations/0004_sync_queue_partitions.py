@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:00
+
+import uuid
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_partitions(apps, schema_editor):
+    SyncQueueItem = apps.get_model('tasks', 'SyncQueueItem')
+    batch = []
+    for item in SyncQueueItem.objects.only('id', 'task_id').iterator(chunk_size=2000):
+        item.partition = uuid.UUID(str(item.task_id)).int % settings.SYNC_PARTITIONS
+        batch.append(item)
+        if len(batch) >= 2000:
+            SyncQueueItem.objects.bulk_update(batch, ['partition'])
+            batch = []
+    if batch:
+        SyncQueueItem.objects.bulk_update(batch, ['partition'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_task_tombstone_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncConsumer',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('heartbeat_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncPartitionLease',
+            fields=[
+                ('partition', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('owner', models.CharField(blank=True, max_length=100, null=True)),
+                ('lease_until', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='syncqueueitem',
+            name='partition',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='syncqueueitem',
+            index=models.Index(fields=['partition', 'status', 'created_at'], name='syncqueue_partition_idx'),
+        ),
+        migrations.RunPython(backfill_partitions, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 import uuid
+from django.conf import settings
 from django.db import models
 from django.utils import timezone
 from django.utils.timezone import now
@@ -15,6 +16,13 @@ OPERATION_CHOICES = [
     ('delete', 'Delete'),
 ]
 
+class VersionConflict(Exception):
+    """Raised when a Task write loses the compare-and-swap on its version."""
+    def __init__(self, task_id, expected):
+        super().__init__(f"Task {task_id} was modified concurrently (expected version {expected})")
+        self.task_id = task_id
+        self.expected = expected
+
 class Task(models.Model):
     # client-generated UUID (so offline client can create & keep same id)
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -27,6 +35,14 @@ class Task(models.Model):
     sync_status = models.CharField(max_length=10, choices=SYNC_STATUS_CHOICES, default='pending')
     server_id = models.CharField(max_length=100, blank=True, null=True)
     last_synced_at = models.DateTimeField(blank=True, null=True)
+    # bumped by every write; writes only succeed against the version they were based on
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # tombstone GC scans soft-deleted tasks by age
+            models.Index(fields=['is_deleted', 'updated_at'], name='task_tombstone_idx'),
+        ]
 
     def soft_delete(self):
         self.is_deleted = True
@@ -39,7 +55,28 @@ class Task(models.Model):
         if not self.updated_at:
             self.updated_at = timezone.now()
         self.updated_at = timezone.now()
-        super().save(*args, **kwargs)
+        if self._state.adding or kwargs.get('force_insert'):
+            super().save(*args, **kwargs)
+            return
+        # compare-and-swap: the UPDATE only matches if nobody bumped the version since we read the row
+        expected = self.version
+        values = {f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields if not f.primary_key}
+        values['version'] = expected + 1
+        if not Task.objects.filter(pk=self.pk, version=expected).update(**values):
+            raise VersionConflict(self.pk, expected)
+        self.version = expected + 1
+
+def partition_for_task(task_id):
+    # fixed hash of the task id, so all items of one task land in the same partition
+    return uuid.UUID(str(task_id)).int % settings.SYNC_PARTITIONS
+
+class SyncQueueItemManager(models.Manager):
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create skips save(), so derive the partition here too
+        objs = list(objs)
+        for obj in objs:
+            obj.partition = partition_for_task(obj.task_id)
+        return super().bulk_create(objs, *args, **kwargs)
 
 class SyncQueueItem(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -50,11 +87,33 @@ class SyncQueueItem(models.Model):
     status = models.CharField(max_length=10, default='pending')  # pending, processing, done, failed
     created_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(blank=True, null=True)
+    partition = models.PositiveSmallIntegerField(default=0)  # derived from task_id, see partition_for_task
+
+    objects = SyncQueueItemManager()
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # partition consumers drain "pending in my partition, oldest first"
+            models.Index(fields=['partition', 'status', 'created_at'], name='syncqueue_partition_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.partition = partition_for_task(self.task_id)
+        super().save(*args, **kwargs)
 
 class SyncLog(models.Model):
     timestamp = models.DateTimeField(default=now)
     processed = models.IntegerField(default=0)
-    failed = models.IntegerField(default=0)
\ No newline at end of file
+    failed = models.IntegerField(default=0)
+
+class SyncConsumer(models.Model):
+    # a running partition consumer; it drops out of the assignment once its heartbeat expires
+    name = models.CharField(max_length=100, primary_key=True)
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+
+class SyncPartitionLease(models.Model):
+    # exclusive ownership of one queue partition; only the owner may process its items
+    partition = models.PositiveSmallIntegerField(primary_key=True)
+    owner = models.CharField(max_length=100, blank=True, null=True)
+    lease_until = models.DateTimeField(blank=True, null=True)
@@ -0,0 +1,177 @@
+"""
+Change notifications for clients that would otherwise poll /api/status and /api/tasks.
+
+Events are small dicts: {"event": "tasks_changed" | "queue_drained", "watermark": int}.
+The watermark only ever grows, so a client passes back the last one it saw and
+gets every newer event (or waits until one arrives).
+
+Waiters always wait on the in-process hub: the views use wait_async, which parks a
+coroutine on an asyncio.Event instead of a thread, so under ASGI an idle client costs
+one event-loop entry. With NOTIFY_BACKEND=postgres, publishing goes through pg_notify
+and a single listener thread per process feeds the hub, so events raised by any
+server process reach every connected client.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from django.conf import settings
+from django.db import connection, transaction
+import logging
+
+logger = logging.getLogger(__name__)
+
+TASKS_CHANGED = "tasks_changed"
+QUEUE_DRAINED = "queue_drained"
+
+CHANNEL = "task_sync_changes"
+
+
+class InProcessHub:
+    def __init__(self, history=256):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=history)
+        self._watermark = 0
+        self._waiters = set()  # (event loop, asyncio.Event) of coroutines in wait_async
+
+    @property
+    def watermark(self):
+        return self._watermark
+
+    def next_watermark(self):
+        # microseconds since epoch, forced strictly increasing within this process
+        with self._cond:
+            return max(self._watermark + 1, time.time_ns() // 1000)
+
+    def deliver(self, event: dict):
+        with self._cond:
+            if event["watermark"] <= self._watermark:
+                # another process' clock may lag ours; keep watermarks increasing
+                event = {**event, "watermark": self._watermark + 1}
+            self._watermark = event["watermark"]
+            self._events.append(event)
+            self._cond.notify_all()
+            waiters = list(self._waiters)
+        for loop, ready in waiters:
+            try:
+                # deliver runs on request and listener threads; wake each loop from its own thread
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                # that loop is closed; its waiter is gone
+                pass
+
+    def events_since(self, since: int):
+        return [e for e in self._events if e["watermark"] > since]
+
+    def wait(self, since: int, timeout: float):
+        """
+        Block until there are events newer than `since` or the timeout expires.
+        Returns the (possibly empty) list of newer events.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                events = self.events_since(since)
+                if events:
+                    return events
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+
+    async def wait_async(self, since: int, timeout: float):
+        """Like wait(), but suspends the calling coroutine instead of blocking a thread."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            waiter = (loop, asyncio.Event())
+            with self._cond:
+                events = self.events_since(since)
+                if events:
+                    return events
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return []
+                self._waiters.add(waiter)
+            try:
+                await asyncio.wait_for(waiter[1].wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                with self._cond:
+                    self._waiters.discard(waiter)
+
+
+hub = InProcessHub()
+
+
+class PostgresListener(threading.Thread):
+    """Background LISTEN on its own connection; forwards NOTIFY payloads to the hub."""
+
+    def __init__(self):
+        super().__init__(name="task-sync-listener", daemon=True)
+
+    def run(self):
+        import select
+        import psycopg2
+
+        db = settings.DATABASES["default"]
+        while True:
+            try:
+                conn = psycopg2.connect(
+                    dbname=db["NAME"], user=db["USER"], password=db["PASSWORD"],
+                    host=db["HOST"], port=db["PORT"],
+                )
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {CHANNEL};")
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        note = conn.notifies.pop(0)
+                        hub.deliver(json.loads(note.payload))
+            except Exception as ex:
+                logger.exception(f"Change listener lost its connection: {ex}")
+                time.sleep(5)
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _use_postgres():
+    return getattr(settings, "NOTIFY_BACKEND", "inprocess") == "postgres"
+
+
+def ensure_listener():
+    # started lazily by the first waiter, so management commands never open it
+    global _listener
+    if not _use_postgres() or _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = PostgresListener()
+            _listener.start()
+
+
+def _send(event: dict):
+    if _use_postgres():
+        with connection.cursor() as cur:
+            cur.execute("SELECT pg_notify(%s, %s)", [CHANNEL, json.dumps(event)])
+    else:
+        hub.deliver(event)
+
+
+def publish(event_type: str, **extra):
+    """Publish an event once the current transaction commits (immediately in autocommit)."""
+    def _fire():
+        event = {"event": event_type, "watermark": hub.next_watermark(), **extra}
+        try:
+            _send(event)
+        except Exception as ex:
+            # a lost notification only delays clients until their next poll
+            logger.exception(f"Could not publish {event_type}: {ex}")
+    transaction.on_commit(_fire)
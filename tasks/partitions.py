@@ -0,0 +1,169 @@
+"""
+Partitioned queue consumers.
+
+Every SyncQueueItem carries partition = hash(task_id) % SYNC_PARTITIONS, so all
+items of one task live in one partition. Consumers register with a heartbeat;
+the live consumers (sorted by name) split the partitions round-robin, and the
+split is recomputed on every drain, which rebalances as consumers join or leave.
+
+The assignment only says which partitions a consumer *should* own. Actual
+ownership is a SyncPartitionLease row taken with a conditional UPDATE, so a
+partition is never drained by two consumers at once, even mid-rebalance: the new
+owner gets it only after the old one releases it or its lease expires. While
+draining, LeaseGuard renews the lease before every partition and, as it runs
+low, before every item; a consumer that lost a lease stops touching it.
+POST /api/sync goes through the same leases (sync_unowned).
+"""
+import threading
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import SyncQueueItem, SyncConsumer, SyncPartitionLease
+from . import services
+from . import notifications
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, "SYNC_CONSUMER_TTL", 30))
+
+
+def heartbeat(consumer: str):
+    SyncConsumer.objects.update_or_create(name=consumer, defaults={"heartbeat_at": timezone.now()})
+
+
+def live_consumers():
+    cutoff = timezone.now() - _ttl()
+    return list(SyncConsumer.objects.filter(heartbeat_at__gte=cutoff).order_by('name').values_list('name', flat=True))
+
+
+def assigned_partitions(consumer: str, consumers: list):
+    if consumer not in consumers:
+        return []
+    return [p for p in range(settings.SYNC_PARTITIONS) if consumers[p % len(consumers)] == consumer]
+
+
+def acquire(consumer: str, partitions):
+    """Take or renew leases; returns the partitions this consumer now owns."""
+    partitions = list(partitions)
+    if not partitions:
+        return []
+    now = timezone.now()
+    SyncPartitionLease.objects.bulk_create([SyncPartitionLease(partition=p) for p in partitions], ignore_conflicts=True)
+    (SyncPartitionLease.objects
+     .filter(partition__in=partitions)
+     .filter(Q(owner=consumer) | Q(owner__isnull=True) | Q(lease_until__lt=now))
+     .update(owner=consumer, lease_until=now + _ttl()))
+    return sorted(SyncPartitionLease.objects.filter(partition__in=partitions, owner=consumer)
+                  .values_list('partition', flat=True))
+
+
+class LeaseGuard:
+    """
+    Keeps the leases of one drain step valid while items are processed.
+    check(item) is passed to process_sync_batch as before_item: it renews the item's
+    partition lease once less than half the TTL is left, and returns False when the
+    lease was lost (another consumer took over), so the rest of that partition is left alone.
+    """
+
+    def __init__(self, consumer: str, partitions):
+        self.consumer = consumer
+        until = timezone.now() + _ttl()
+        self._until = {p: until for p in partitions}
+        self._lock = threading.Lock()
+
+    def renew(self, partition):
+        now = timezone.now()
+        # still ours as long as nobody replaced us as owner, even if it ran out meanwhile
+        ok = SyncPartitionLease.objects.filter(partition=partition, owner=self.consumer).update(lease_until=now + _ttl())
+        with self._lock:
+            if ok:
+                self._until[partition] = now + _ttl()
+            else:
+                self._until.pop(partition, None)
+        return bool(ok)
+
+    def check(self, item):
+        with self._lock:
+            until = self._until.get(item.partition)
+        if until is None:
+            return False
+        if until - timezone.now() > _ttl() / 2:
+            return True
+        return self.renew(item.partition)
+
+
+def release(consumer: str, partitions=None):
+    qs = SyncPartitionLease.objects.filter(owner=consumer)
+    if partitions is not None:
+        qs = qs.filter(partition__in=partitions)
+    qs.update(owner=None, lease_until=None)
+
+
+def leave(consumer: str):
+    # give partitions back right away instead of waiting for the leases to expire
+    release(consumer)
+    SyncConsumer.objects.filter(name=consumer).delete()
+
+
+def drain_once(consumer: str, batch_size=None):
+    """
+    One consumer step: heartbeat, rebalance, then process up to batch_size pending
+    items from each owned partition in created_at order. Publishes queue_drained
+    when the step processed items and none are left pending.
+    Returns the usual sync summary plus the partitions that were drained.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, "SYNC_BATCH_SIZE", 50)
+    heartbeat(consumer)
+    wanted = assigned_partitions(consumer, live_consumers())
+    release(consumer, [p for p in range(settings.SYNC_PARTITIONS) if p not in wanted])
+    owned = acquire(consumer, wanted)
+
+    guard = LeaseGuard(consumer, owned)
+    summary = {"processed": 0, "failed": 0, "conflicts": 0, "errors": [], "partitions": owned}
+    for p in owned:
+        # earlier partitions may have taken a while; make sure this one is still ours
+        if not guard.renew(p):
+            continue
+        items = services.fetch_pending_queue(batch_size, partitions=[p])
+        part = services.process_sync_batch(items, before_item=guard.check)
+        summary["processed"] += part["processed"]
+        summary["failed"] += part["failed"]
+        summary["conflicts"] += part["conflicts"]
+        summary["errors"].extend(part["errors"])
+    # same event as POST /api/sync; idle steps stay quiet so polling consumers do not spam it
+    if (summary["processed"] or summary["failed"]) and services.pending_sync_count() == 0:
+        notifications.publish(notifications.QUEUE_DRAINED)
+    return summary
+
+
+def sync_unowned(batch_size=None, workers=None):
+    """
+    POST /api/sync: process pending items of the partitions no consumer currently holds.
+    It takes short-lived leases on them like any consumer (without joining the
+    assignment), so it never runs at the same time as a sync_consumer on the same partition.
+    """
+    name = f"api-sync-{uuid.uuid4().hex[:12]}"
+    owned = acquire(name, range(settings.SYNC_PARTITIONS))
+    try:
+        guard = LeaseGuard(name, owned)
+        items = services.fetch_pending_queue(batch_size, partitions=owned)
+        return services.process_sync_batch_parallel(items, workers, before_item=guard.check)
+    finally:
+        release(name)
+
+
+def partition_depths():
+    """Pending items, lease owner and lease expiry for every partition."""
+    pending = dict(SyncQueueItem.objects.filter(status='pending')
+                   .values_list('partition').annotate(n=Count('id')).order_by())
+    leases = {l.partition: l for l in SyncPartitionLease.objects.all()}
+    now = timezone.now()
+    depths = []
+    for p in range(settings.SYNC_PARTITIONS):
+        lease = leases.get(p)
+        owner = lease.owner if lease and lease.lease_until and lease.lease_until >= now else None
+        depths.append({"partition": p, "pending": pending.get(p, 0), "owner": owner})
+    return depths
@@ -0,0 +1,115 @@
+"""
+Opt-in request profiling.
+
+A request is profiled when it carries a valid X-Profile-Token header (minted with
+`manage.py profiles token`) or is picked by PROFILE_SAMPLE_RATE. The request runs
+under cProfile with every SQL statement timed; the stats go to PROFILE_DIR as
+<id>.prof plus an <id>.json summary. Use `manage.py profiles list|show` to read them.
+"""
+import cProfile
+import json
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger(__name__)
+
+HEADER = "X-Profile-Token"
+SALT = "tasks.profiling"
+
+# cProfile cannot run in two threads at once on newer Pythons; concurrent
+# requests simply go unprofiled while one capture is in progress
+_active = threading.Lock()
+
+
+def make_token():
+    return signing.TimestampSigner(salt=SALT).sign("profile")
+
+
+def _token_ok(token):
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(token, max_age=getattr(settings, "PROFILE_TOKEN_MAX_AGE", 3600))
+        return True
+    except signing.BadSignature:
+        return False
+
+
+def profile_dir():
+    return Path(getattr(settings, "PROFILE_DIR", settings.BASE_DIR / "profiles"))
+
+
+class _QueryTimer:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({"sql": sql, "ms": round((time.perf_counter() - start) * 1000, 3), "many": many})
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _wanted(self, request):
+        token = request.headers.get(HEADER)
+        if token:
+            return _token_ok(token)
+        rate = getattr(settings, "PROFILE_SAMPLE_RATE", 0.0)
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self._wanted(request) or not _active.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self._profile(request)
+        finally:
+            _active.release()
+
+    def _profile(self, request):
+        timer = _QueryTimer()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        elapsed = time.perf_counter() - start
+
+        try:
+            self._store(request, response, profiler, timer.queries, elapsed)
+        except Exception as ex:
+            # never fail the request because the capture could not be written
+            logger.exception(f"Could not store request profile: {ex}")
+        return response
+
+    def _store(self, request, response, profiler, queries, elapsed):
+        out = profile_dir()
+        out.mkdir(parents=True, exist_ok=True)
+        now = timezone.now()
+        profile_id = f"{now.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        profiler.dump_stats(out / f"{profile_id}.prof")
+        meta = {
+            "id": profile_id,
+            "timestamp": now.isoformat().replace("+00:00", "Z"),
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "duration_ms": round(elapsed * 1000, 3),
+            "sql_count": len(queries),
+            "sql_ms": round(sum(q["ms"] for q in queries), 3),
+            "queries": queries,
+        }
+        (out / f"{profile_id}.json").write_text(json.dumps(meta, indent=2))
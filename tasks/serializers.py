@@ -4,8 +4,8 @@ from .models import Task, SyncQueueItem
 class TaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = Task
-        fields = ['id','title','description','completed','created_at','updated_at','is_deleted','sync_status','server_id','last_synced_at']
-        read_only_fields = ['sync_status','server_id','last_synced_at','created_at','updated_at']
+        fields = ['id','title','description','completed','created_at','updated_at','is_deleted','sync_status','server_id','last_synced_at','version']
+        read_only_fields = ['sync_status','server_id','last_synced_at','created_at','updated_at','version']
 
 class TaskCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -27,8 +27,10 @@ class TaskUpdateSerializer(serializers.ModelSerializer):
             'server_id',
             'sync_status',
             'last_synced_at',
+            'version',      # version the client edited; checked with compare-and-swap
         ]
         read_only_fields = ['created_at', 'server_id', 'sync_status', 'last_synced_at']
+        extra_kwargs = {'version': {'min_value': 1}}   # versions start at 1
 
 
 class SyncQueueItemSerializer(serializers.ModelSerializer):
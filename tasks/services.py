@@ -1,14 +1,24 @@
+import json
 import uuid
+import threading
+from datetime import timedelta
 from django.utils import timezone
 from django.conf import settings
 from .models import Task, SyncQueueItem
-from django.db import transaction
-from dateutil import parser as dateparser
-from django.db.models import Q
+from . import notifications
+from django.db import transaction, connections, IntegrityError
+from concurrent.futures import ThreadPoolExecutor
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Coalesce
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _parse_datetime(value):
+    # dateutil is slow to import; only load it once a client timestamp needs parsing
+    from dateutil import parser as dateparser
+    return dateparser.parse(value)
+
 # helper: snapshot
 def _task_snapshot_from_instance(task: Task):
     return {
@@ -20,11 +30,23 @@ def _task_snapshot_from_instance(task: Task):
         "updated_at": task.updated_at.isoformat() if task.updated_at else None,
         "is_deleted": task.is_deleted,
         "server_id": task.server_id,
+        # snapshots are taken right after a write: it turned base_version into version
+        "version": task.version,
+        "base_version": task.version - 1,
     }
 
+# set to a list by group_commit while it runs a mutation; items are bulk-inserted at flush
+_group_buffer = threading.local()
+
 def enqueue_operation(operation: str, task_id, snapshot: dict):
+    item = SyncQueueItem(operation=operation, task_id=task_id, task_snapshot=snapshot)
+    buffer = getattr(_group_buffer, "items", None)
+    if buffer is not None:
+        buffer.append(item)
+        return item
     # store queue item
-    return SyncQueueItem.objects.create(operation=operation, task_id=task_id, task_snapshot=snapshot)
+    item.save(force_insert=True)
+    return item
 
 # Task CRUD operations (server-side)
 def create_task(data: dict, from_client=True):
@@ -58,6 +80,7 @@ def create_task(data: dict, from_client=True):
     else:
         # created new -> enqueue create
         enqueue_operation('create', task.id, _task_snapshot_from_instance(task))
+    notifications.publish(notifications.TASKS_CHANGED)
     return task
 
 def update_task(task_id, data: dict):
@@ -73,14 +96,18 @@ def update_task(task_id, data: dict):
     # client may send updated_at; use it so sync can apply last-write-wins
     if data.get('updated_at'):
         try:
-            task.updated_at = dateparser.parse(data.get('updated_at'))
+            task.updated_at = _parse_datetime(data.get('updated_at'))
         except Exception:
             task.updated_at = timezone.now()
     else:
         task.updated_at = timezone.now()
     task.sync_status = 'pending'
+    if data.get('version') is not None:
+        # the version the client edited; save() raises VersionConflict if the task moved on
+        task.version = int(data.get('version'))
     task.save()
     enqueue_operation('update', task.id, _task_snapshot_from_instance(task))
+    notifications.publish(notifications.TASKS_CHANGED)
     return task
 
 def delete_task_soft(task_id):
@@ -93,27 +120,129 @@ def delete_task_soft(task_id):
     task.updated_at = timezone.now()
     task.save()
     enqueue_operation('delete', task.id, _task_snapshot_from_instance(task))
+    notifications.publish(notifications.TASKS_CHANGED)
     return True
 
 # Sync orchestration
+def _new_server_id():
+    # server_id format: srv_<uuid4>
+    return f"srv_{uuid.uuid4().hex[:12]}"
+
 def _apply_server_assignments(task: Task):
-    # assign a server_id when newly created on server-side. server_id format: srv_<uuid4>
+    # assign a server_id when newly created on server-side
     if not task.server_id:
-        task.server_id = f"srv_{uuid.uuid4().hex[:12]}"
+        task.server_id = _new_server_id()
     task.last_synced_at = timezone.now()
     task.sync_status = 'synced'
-    task.save()
+    # sync bookkeeping only, the content is unchanged: no new version (save() would bump it)
+    Task.objects.filter(pk=task.pk).update(
+        server_id=task.server_id, last_synced_at=task.last_synced_at, sync_status=task.sync_status)
+
+def _conflict_error(task_id, op):
+    return {
+        "task_id": str(task_id),
+        "operation": op,
+        "error": "Conflict resolved using version check (server wins)",
+        "timestamp": timezone.now().isoformat().replace("+00:00", "Z")
+    }
+
+def _apply_queue_item(client_task_id, op, snap, client_updated_at):
+    """
+    Apply one queue item with a single conditional UPDATE and report whether it lost a conflict.
+    The snapshot records the write it came from: base_version -> version. The UPDATE matches
+    the row in three cases and CASE expressions pick what it writes:
+    - the row is still at base_version (the change never reached it): apply it and bump;
+    - the row still holds exactly that write (version and updated_at match): mark it synced,
+      without a new version;
+    - the row is past `version`: later writes, each based on the previous one (Task.save is
+      compare-and-swap), superseded this item; the row is left as it is and their items sync it.
+    No match means another writer got in between, or the server has no such task: a
+    create/update then tries to insert it, and the insert failing on the id is the conflict.
+    Only a delete that matched nothing needs a SELECT, to tell a missing task (nothing to do)
+    from a conflict. Snapshots queued before versions existed fall back to comparing updated_at.
+    Returns True if the item was applied, confirmed or superseded, False on conflict (server wins).
+    """
+    now = timezone.now()
+    content = {}
+    if client_updated_at:
+        content["updated_at"] = client_updated_at
+    if op == "delete":
+        content["is_deleted"] = True
+    else:
+        for field in ("title", "description", "completed", "is_deleted"):
+            if field in snap:
+                content[field] = snap[field]
+    markers = {
+        "sync_status": Value("synced"),
+        "last_synced_at": Value(now),
+        "server_id": Coalesce("server_id", Value(_new_server_id())),
+    }
+
+    row = Task.objects.filter(id=client_task_id)
+    base = snap.get("base_version")
+    if base is not None:
+        result = snap.get("version", base + 1)
+        apply = Q(version=base)
+        confirm = Q(version=result)
+        if client_updated_at:
+            confirm &= Q(updated_at=client_updated_at)
+
+        def when(cond, then, field):
+            return Case(When(cond, then=then), default=F(field), output_field=Task._meta.get_field(field))
+
+        values = {f: when(apply, Value(v), f) for f, v in content.items()}
+        values.update({f: when(apply | confirm, v, f) for f, v in markers.items()})
+        values["version"] = when(apply, F("version") + 1, "version")
+        matched = row.filter(apply | confirm | Q(version__gt=result)).update(**values)
+    else:
+        matched = 0
+        if client_updated_at:
+            legacy = row.filter(updated_at__lt=client_updated_at) if op == "create" else row.filter(updated_at__lte=client_updated_at)
+            matched = legacy.update(**content, **markers, version=F("version") + 1)
+    if matched:
+        return True
+
+    if op == "delete":
+        # a missing task has nothing to delete; an existing one was changed by another writer
+        return not row.exists()
+
+    # create/update of a task the server does not have yet: insert it
+    task = Task(
+        id=client_task_id,
+        title=snap.get("title", ""),
+        description=snap.get("description", ""),
+        completed=snap.get("completed", False),
+        created_at=snap.get("created_at") and _parse_datetime(snap.get("created_at")) or now,
+        updated_at=client_updated_at or now,
+        is_deleted=snap.get("is_deleted", False),
+        sync_status="synced",
+        server_id=_new_server_id(),
+        last_synced_at=now,
+    )
+    try:
+        with transaction.atomic():
+            # bulk_create inserts as-is (Task.save would reset updated_at) and fails if the id exists
+            Task.objects.bulk_create([task])
+        return True
+    except IntegrityError:
+        # someone created it between our UPDATE and the insert: another writer got in between
+        return False
 
-def process_sync_batch(items: list):
+def process_sync_batch(items: list, before_item=None):
     """
     Process a list of SyncQueueItem instances.
-    Conflict resolution: last-write-wins based on updated_at timestamps.
+    before_item: optional callable; items for which it returns False are left pending
+    (partition consumers use it to stop when they lose a partition lease).
+    Conflict resolution: version check against the write each item came from (see
+    _apply_queue_item); only a write that another writer got ahead of is a conflict (server wins).
     Returns dict with summary in company API format.
     """
-    summary = {"processed": 0, "failed": 0, "errors": []}
+    summary = {"processed": 0, "failed": 0, "conflicts": 0, "errors": []}
     max_retry = getattr(settings, "MAX_RETRY", 3)
 
     for item in items:
+        if before_item is not None and not before_item(item):
+            continue
         try:
             item.status = "processing"
             item.save()
@@ -125,98 +254,15 @@ def process_sync_batch(items: list):
             client_updated_at = None
             if snap.get("updated_at"):
                 try:
-                    client_updated_at = dateparser.parse(snap.get("updated_at"))
+                    client_updated_at = _parse_datetime(snap.get("updated_at"))
                 except Exception:
                     client_updated_at = timezone.now()
 
-            server_task = Task.objects.filter(id=client_task_id).first()
-
-            if op == "create":
-                if not server_task:
-                    # create new task
-                    server_task = Task(
-                        id=client_task_id,
-                        title=snap.get("title", ""),
-                        description=snap.get("description", ""),
-                        completed=snap.get("completed", False),
-                        created_at = snap.get("created_at") and dateparser.parse(snap.get("created_at")) or timezone.now(),
-                        updated_at = client_updated_at or timezone.now(),
-                        is_deleted = snap.get("is_deleted", False),
-                        sync_status = "synced",
-                    )
-                    server_task.save()
-                    _apply_server_assignments(server_task)
-                else:
-                    # conflict: last-write-wins
-                    if client_updated_at and client_updated_at > server_task.updated_at:
-                        server_task.title = snap.get("title", server_task.title)
-                        server_task.description = snap.get("description", server_task.description)
-                        server_task.completed = snap.get("completed", server_task.completed)
-                        server_task.is_deleted = snap.get("is_deleted", server_task.is_deleted)
-                        server_task.updated_at = client_updated_at
-                        server_task.sync_status = "synced"
-                        server_task.save()
-                        _apply_server_assignments(server_task)
-                    else:
-                        # conflict resolved: server wins
-                        summary["errors"].append({
-                            "task_id": str(server_task.id),
-                            "operation": op,
-                            "error": "Conflict resolved using last-write-wins",
-                            "timestamp": timezone.now().isoformat().replace("+00:00", "Z")
-                        })
-
-            elif op == "update":
-                if not server_task:
-                    # create missing server task
-                    server_task = Task(
-                        id=client_task_id,
-                        title=snap.get("title", ""),
-                        description=snap.get("description", ""),
-                        completed=snap.get("completed", False),
-                        created_at = snap.get("created_at") and dateparser.parse(snap.get("created_at")) or timezone.now(),
-                        updated_at = client_updated_at or timezone.now(),
-                        is_deleted = snap.get("is_deleted", False),
-                        sync_status = "synced",
-                    )
-                    server_task.save()
-                    _apply_server_assignments(server_task)
-                else:
-                    if client_updated_at and client_updated_at >= server_task.updated_at:
-                        server_task.title = snap.get("title", server_task.title)
-                        server_task.description = snap.get("description", server_task.description)
-                        server_task.completed = snap.get("completed", server_task.completed)
-                        server_task.is_deleted = snap.get("is_deleted", server_task.is_deleted)
-                        server_task.updated_at = client_updated_at
-                        server_task.sync_status = "synced"
-                        server_task.save()
-                        _apply_server_assignments(server_task)
-                    else:
-                        # server wins
-                        summary["errors"].append({
-                            "task_id": str(server_task.id),
-                            "operation": op,
-                            "error": "Conflict resolved using last-write-wins",
-                            "timestamp": timezone.now().isoformat().replace("+00:00", "Z")
-                        })
-
-            elif op == "delete":
-                if server_task:
-                    if client_updated_at and client_updated_at >= server_task.updated_at:
-                        server_task.is_deleted = True
-                        server_task.updated_at = client_updated_at
-                        server_task.sync_status = "synced"
-                        server_task.save()
-                        _apply_server_assignments(server_task)
-                    else:
-                        # server wins
-                        summary["errors"].append({
-                            "task_id": str(server_task.id),
-                            "operation": op,
-                            "error": "Conflict resolved using last-write-wins",
-                            "timestamp": timezone.now().isoformat().replace("+00:00", "Z")
-                        })
-                # else: nothing to delete
+            if op not in ("create", "update", "delete"):
+                raise ValueError(f"unknown operation {op}")
+            if not _apply_queue_item(client_task_id, op, snap, client_updated_at):
+                summary["conflicts"] += 1
+                summary["errors"].append(_conflict_error(client_task_id, op))
 
             item.status = "done"
             item.processed_at = timezone.now()
@@ -236,12 +282,104 @@ def process_sync_batch(items: list):
                 "timestamp": timezone.now().isoformat().replace("+00:00", "Z")
             })
 
+    if summary["processed"]:
+        notifications.publish(notifications.TASKS_CHANGED)
+    return summary
+
+# Parallel sync: shard a batch by task id so each task's items stay in order
+def shard_for_task(task_id, shards: int):
+    # stable across processes (unlike hash()), so a task always maps to the same shard
+    return uuid.UUID(str(task_id)).int % shards
+
+def _shard_items(items, shards: int):
+    buckets = [[] for _ in range(shards)]
+    for item in items:
+        # items arrive ordered by created_at; appending keeps that order per task
+        buckets[shard_for_task(item.task_id, shards)].append(item)
+    return [b for b in buckets if b]
+
+def _process_shard(items: list, before_item=None):
+    try:
+        return process_sync_batch(items, before_item)
+    finally:
+        # each worker thread gets its own DB connection; release it when done
+        connections.close_all()
+
+def process_sync_batch_parallel(items, workers=None, before_item=None):
+    """
+    Same as process_sync_batch, but items are sharded by task_id across a thread pool.
+    Items for one task are always handled by the same worker, in order; independent
+    tasks proceed concurrently. Per-shard summaries are merged into the usual format.
+    """
+    if workers is None:
+        workers = getattr(settings, "SYNC_WORKERS", 1)
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return process_sync_batch(items, before_item)
+
+    shards = _shard_items(items, workers)
+    summary = {"processed": 0, "failed": 0, "conflicts": 0, "errors": []}
+    with ThreadPoolExecutor(max_workers=len(shards)) as pool:
+        for part in pool.map(_process_shard, shards, [before_item] * len(shards)):
+            summary["processed"] += part["processed"]
+            summary["failed"] += part["failed"]
+            summary["conflicts"] += part["conflicts"]
+            summary["errors"].extend(part["errors"])
     return summary
 
-def fetch_pending_queue(batch_size=None):
+def fetch_pending_queue(batch_size=None, partitions=None):
     if batch_size is None:
         batch_size = getattr(settings, "SYNC_BATCH_SIZE", 50)
-    return list(SyncQueueItem.objects.filter(status='pending').order_by('created_at')[:batch_size])
+    qs = SyncQueueItem.objects.filter(status='pending')
+    if partitions is not None:
+        qs = qs.filter(partition__in=partitions)
+    return list(qs.order_by('created_at')[:batch_size])
 
 def pending_sync_count():
     return SyncQueueItem.objects.filter(status='pending').count()
+
+# Tombstone GC: soft-deleted tasks are kept for TOMBSTONE_HORIZON_DAYS so delta-syncing
+# clients still see the delete, then removed together with their queue history.
+def collect_tombstones(horizon_days=None, chunk_size=1000, archive=None, dry_run=False):
+    """
+    Hard-delete soft-deleted tasks whose last update is older than the horizon.
+    Tasks that still have pending/processing queue items are left alone.
+    archive: optional text file; each removed task is written to it as a JSON line.
+    Returns {"tasks": n, "queue_items": m}.
+    """
+    if horizon_days is None:
+        horizon_days = getattr(settings, "TOMBSTONE_HORIZON_DAYS", 30)
+    min_days = getattr(settings, "TOMBSTONE_MIN_HORIZON_DAYS", 7)
+    if horizon_days < min_days:
+        raise ValueError(f"horizon of {horizon_days} days is below the minimum of {min_days} days")
+
+    cutoff = timezone.now() - timedelta(days=horizon_days)
+    in_flight = SyncQueueItem.objects.filter(status__in=['pending', 'processing']).values('task_id')
+    candidates = (Task.objects.filter(is_deleted=True, updated_at__lt=cutoff)
+                  .exclude(id__in=in_flight).order_by('updated_at'))
+
+    if dry_run:
+        ids = candidates.values('id')
+        return {"tasks": candidates.count(),
+                "queue_items": SyncQueueItem.objects.filter(task_id__in=ids).count()}
+
+    removed = {"tasks": 0, "queue_items": 0}
+    while True:
+        with transaction.atomic():
+            # lock the chunk so a PUT cannot revive a task between this SELECT and the DELETE
+            chunk = list(candidates.select_for_update()[:chunk_size])
+            if not chunk:
+                break
+            ids = [t.id for t in chunk]
+            # the DELETE re-checks the candidate predicate as well (no row locks on SQLite)
+            removed["tasks"] += candidates.filter(id__in=ids).delete()[0]
+            gone = set(ids) - set(Task.objects.filter(id__in=ids).values_list('id', flat=True))
+            # queue items only of the tasks really removed; a revived task keeps its new items
+            removed["queue_items"] += SyncQueueItem.objects.filter(task_id__in=gone).delete()[0]
+            if archive is not None:
+                for task in chunk:
+                    if task.id in gone:
+                        archive.write(json.dumps(_task_snapshot_from_instance(task)) + "\n")
+        if len(chunk) < chunk_size:
+            break
+    return removed
@@ -1,6 +1,8 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
+from django.conf import settings
+from django.utils import timezone
 from .models import Task
 import uuid
 
@@ -27,3 +29,526 @@ class TaskAPITest(TestCase):
         from .models import Task
         t = Task.objects.get(id=tid)
         self.assertTrue(t.is_deleted)
+
+
+class ParallelSyncTest(TestCase):
+    def _enqueue(self, task_id, title):
+        from .models import SyncQueueItem
+        return SyncQueueItem.objects.create(
+            operation='update', task_id=task_id,
+            task_snapshot={"id": str(task_id), "title": title,
+                           "updated_at": timezone.now().isoformat()},
+        )
+
+    def test_shards_keep_per_task_order(self):
+        from . import services
+        ids = [uuid.uuid4() for _ in range(5)]
+        items = [self._enqueue(ids[i % 5], f"t{i}") for i in range(20)]
+        shards = services._shard_items(items, 3)
+        self.assertEqual(sum(len(s) for s in shards), 20)
+        for shard in shards:
+            for tid in {it.task_id for it in shard}:
+                titles = [it.task_snapshot["title"] for it in shard if it.task_id == tid]
+                expected = [it.task_snapshot["title"] for it in items if it.task_id == tid]
+                self.assertEqual(titles, expected)
+            # a task never spans two shards
+            others = [it for s in shards if s is not shard for it in s]
+            self.assertFalse({it.task_id for it in shard} & {it.task_id for it in others})
+
+    def test_single_worker_matches_serial(self):
+        from . import services
+        a, b = uuid.uuid4(), uuid.uuid4()
+        items = [self._enqueue(a, "a"), self._enqueue(b, "b")]
+        summary = services.process_sync_batch_parallel(items, workers=1)
+        self.assertEqual(summary["processed"], 2)
+        self.assertEqual(Task.objects.get(id=a).title, "a")
+        self.assertEqual(Task.objects.get(id=b).title, "b")
+
+
+class ParallelSyncThreadPoolTest(TransactionTestCase):
+    # worker threads use their own connections, so the data must really be committed
+
+    def test_workers_merge_summaries_and_keep_task_order(self):
+        from datetime import timedelta
+        from . import services
+        from .models import SyncQueueItem
+        base = timezone.now()
+        ids = [uuid.uuid4() for _ in range(8)]
+        for step in range(3):
+            for n, tid in enumerate(ids):
+                SyncQueueItem.objects.create(
+                    operation='create' if step == 0 else 'update', task_id=tid,
+                    task_snapshot={"id": str(tid), "title": f"{n}-{step}",
+                                   "updated_at": (base + timedelta(seconds=step)).isoformat()},
+                )
+        # one item for a task that cannot be parsed fails without stopping the others
+        bad = SyncQueueItem.objects.create(operation='bogus', task_id=uuid.uuid4(), task_snapshot={})
+
+        items = services.fetch_pending_queue(100)
+        summary = services.process_sync_batch_parallel(items, workers=4)
+
+        self.assertEqual(summary["processed"], 24)
+        self.assertEqual(summary["failed"], 1)
+        self.assertEqual(summary["conflicts"], 0)
+        self.assertEqual([e["task_id"] for e in summary["errors"]], [str(bad.task_id)])
+        for n, tid in enumerate(ids):
+            task = Task.objects.get(id=tid)
+            self.assertEqual((task.title, task.sync_status), (f"{n}-2", "synced"))
+        self.assertEqual(SyncQueueItem.objects.filter(status='done').count(), 24)
+
+
+class ChangeNotificationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_changes_returns_watermark_without_since(self):
+        r = self.client.get('/api/changes/')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["events"], [])
+        self.assertIn("watermark", r.json())
+
+    def test_task_create_publishes_tasks_changed(self):
+        since = self.client.get('/api/changes/').json()["watermark"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/', {"title": "n"}, format='json')
+        r = self.client.get('/api/changes/', {"since": since, "timeout": 0})
+        events = r.json()["events"]
+        self.assertEqual(events[-1]["event"], "tasks_changed")
+        self.assertGreater(r.json()["watermark"], since)
+
+    def test_long_poll_times_out_without_events(self):
+        from .notifications import hub
+        r = self.client.get('/api/changes/', {"since": hub.watermark, "timeout": 0})
+        self.assertEqual(r.json()["events"], [])
+
+    async def test_stream_under_asgi_sends_keep_alive_then_events(self):
+        import asyncio, threading
+        from django.test import AsyncClient, override_settings
+        from .notifications import hub
+        with override_settings(NOTIFY_LONGPOLL_TIMEOUT=0.2):
+            r = await AsyncClient().get('/api/changes/stream/', {"since": hub.watermark})
+        self.assertEqual(r["Content-Type"], "text/event-stream")
+        frames = aiter(r.streaming_content)
+        first = await asyncio.wait_for(anext(frames), 5)
+        self.assertEqual(first, b": keep-alive\n\n")
+
+        # delivered from another thread, as the Postgres listener and sync views do
+        threading.Timer(0.05, hub.deliver, [{"event": "tasks_changed", "watermark": hub.next_watermark()}]).start()
+        frame = await asyncio.wait_for(anext(frames), 5)
+        self.assertIn(b"event: tasks_changed", frame)
+        self.assertIn(f"id: {hub.watermark}".encode(), frame)
+        await frames.aclose()
+
+    def test_stream_under_wsgi_sends_pending_events(self):
+        from .notifications import hub
+        since = hub.watermark
+        hub.deliver({"event": "queue_drained", "watermark": hub.next_watermark()})
+        r = self.client.get('/api/changes/stream/', {"since": since})
+        frame = next(iter(r.streaming_content))
+        self.assertTrue(frame.startswith(f"id: {hub.watermark}\nevent: queue_drained\n".encode()))
+
+
+class ImportExportCommandTest(TestCase):
+    def test_import_then_export_round_trip(self):
+        import json, os, tempfile
+        from django.core.management import call_command
+        from .models import SyncQueueItem
+        ids = [str(uuid.uuid4()) for _ in range(3)]
+        with tempfile.TemporaryDirectory() as d:
+            src, dst = os.path.join(d, "in.jsonl"), os.path.join(d, "out.jsonl")
+            with open(src, "w") as f:
+                for i, tid in enumerate(ids):
+                    f.write(json.dumps({"id": tid, "title": f"t{i}", "updated_at": "2025-01-01T00:00:00Z"}) + "\n")
+            call_command("import_tasks", src, "--chunk-size", "2", "--enqueue", stdout=open(os.devnull, "w"), stderr=open(os.devnull, "w"))
+            self.assertEqual(Task.objects.filter(id__in=ids).count(), 3)
+            self.assertEqual(SyncQueueItem.objects.filter(task_id__in=ids).count(), 3)
+
+            call_command("export_tasks", dst, stderr=open(os.devnull, "w"))
+            with open(dst) as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual(sorted(r["id"] for r in rows), sorted(ids))
+        self.assertTrue(all(r["updated_at"].startswith("2025-01-01") for r in rows))
+
+    def _import(self, lines, *args):
+        import json, os, tempfile
+        from django.core.management import call_command
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+            f.write("".join(json.dumps(line) + "\n" for line in lines))
+        self.addCleanup(os.unlink, f.name)
+        call_command("import_tasks", f.name, *args, stdout=open(os.devnull, "w"), stderr=open(os.devnull, "w"))
+
+    def test_enqueue_skips_rows_that_already_exist(self):
+        from . import services
+        from .models import SyncQueueItem
+        existing = Task.objects.create(title="keep")
+        new_id = str(uuid.uuid4())
+        self._import([{"id": str(existing.id), "title": "dupe"},
+                      {"id": new_id, "title": "new"},
+                      {"id": new_id, "title": "new again"}], "--enqueue")
+
+        self.assertEqual(list(SyncQueueItem.objects.values_list("task_id", flat=True)), [uuid.UUID(new_id)])
+        services.process_sync_batch(services.fetch_pending_queue())
+        self.assertEqual(Task.objects.get(id=existing.id).title, "keep")
+        self.assertEqual(Task.objects.get(id=new_id).title, "new")
+
+    def test_non_boolean_flags_are_rejected_with_line_number(self):
+        from django.core.management.base import CommandError
+        self._import([{"title": "s", "completed": "false", "is_deleted": True}])
+        self.assertEqual(Task.objects.get(title="s").completed, False)
+        with self.assertRaisesRegex(CommandError, "line 2: completed"):
+            self._import([{"title": "a"}, {"title": "b", "completed": "no"}])
+
+    def test_non_object_line_is_rejected_with_line_number(self):
+        from django.core.management.base import CommandError
+        for line in ([1], "x"):
+            with self.assertRaisesRegex(CommandError, "line 2: expected a JSON object"):
+                self._import([{"title": "a"}, line])
+
+
+class GroupCommitTest(TestCase):
+    def _batch(self, *calls):
+        from concurrent.futures import Future
+        return [(fn, args, {}, Future()) for fn, *args in calls]
+
+    def test_flush_bulk_inserts_queue_items_and_isolates_failures(self):
+        from . import services
+        from .group_commit import GroupCommitter
+        from .models import SyncQueueItem
+
+        def boom():
+            services.create_task({"title": "rolled back"})
+            raise RuntimeError("bad mutation")
+
+        a, b = str(uuid.uuid4()), str(uuid.uuid4())
+        batch = self._batch((services.create_task, {"id": a, "title": "a"}),
+                            (boom,),
+                            (services.create_task, {"id": b, "title": "b"}))
+        GroupCommitter(0.01, 10)._flush(batch)
+
+        self.assertEqual(batch[0][3].result().title, "a")
+        self.assertRaises(RuntimeError, batch[1][3].result)
+        self.assertEqual(batch[2][3].result().title, "b")
+        self.assertEqual(Task.objects.count(), 2)
+        self.assertEqual(SyncQueueItem.objects.count(), 2)
+        self.assertIsNone(getattr(services._group_buffer, "items", None))
+
+
+class TombstoneGCTest(TestCase):
+    def _tombstone(self, days_old, queue_status='done'):
+        from datetime import timedelta
+        from .models import SyncQueueItem
+        task = Task.objects.create(title="gone", is_deleted=True)
+        # Task.save always bumps updated_at, so age it with a queryset update
+        Task.objects.filter(id=task.id).update(updated_at=timezone.now() - timedelta(days=days_old))
+        SyncQueueItem.objects.create(operation='delete', task_id=task.id, task_snapshot={}, status=queue_status)
+        return task.id
+
+    def test_collects_only_old_settled_tombstones(self):
+        from . import services
+        from .models import SyncQueueItem
+        old = self._tombstone(60)
+        recent = self._tombstone(1)
+        unsynced = self._tombstone(60, queue_status='pending')
+        live = Task.objects.create(title="live")
+
+        removed = services.collect_tombstones(horizon_days=30, chunk_size=1)
+        self.assertEqual(removed, {"tasks": 1, "queue_items": 1})
+        self.assertFalse(Task.objects.filter(id=old).exists())
+        self.assertFalse(SyncQueueItem.objects.filter(task_id=old).exists())
+        self.assertEqual(Task.objects.filter(id__in=[recent, unsynced, live.id]).count(), 3)
+
+    def test_task_revived_during_collection_is_kept(self):
+        from unittest import mock
+        from django.db.models.query import QuerySet
+        from . import services
+        from .models import SyncQueueItem
+        old = self._tombstone(60)
+        revived = self._tombstone(60)
+        real_delete = QuerySet.delete
+
+        def revive_then_delete(qs):
+            # a PUT undeletes the task after the chunk was selected, before the DELETE runs
+            if qs.model is Task and not SyncQueueItem.objects.filter(task_id=revived, status='pending').exists():
+                task = Task.objects.get(id=revived)
+                task.is_deleted = False
+                task.save()
+                services.enqueue_operation('update', task.id, services._task_snapshot_from_instance(task))
+            return real_delete(qs)
+
+        with mock.patch.object(QuerySet, 'delete', revive_then_delete):
+            removed = services.collect_tombstones(horizon_days=30)
+        self.assertEqual(removed, {"tasks": 1, "queue_items": 1})
+        self.assertFalse(Task.objects.filter(id=old).exists())
+        self.assertFalse(Task.objects.get(id=revived).is_deleted)
+        self.assertEqual(SyncQueueItem.objects.filter(task_id=revived).count(), 2)
+
+    def test_horizon_below_minimum_is_rejected(self):
+        from . import services
+        with self.assertRaises(ValueError):
+            services.collect_tombstones(horizon_days=0)
+
+
+class GroupCommitFlusherTest(TransactionTestCase):
+    # the flusher is a real thread here, so use committed data and its own connection
+
+    def test_flusher_survives_errors_and_restarts(self):
+        from unittest import mock
+        from .group_commit import GroupCommitter
+        committer = GroupCommitter(0.001, 10, timeout=5)
+        self.addCleanup(committer.stop)
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("db went away")
+
+        with mock.patch('tasks.group_commit.close_old_connections', side_effect=flaky):
+            with self.assertRaisesRegex(RuntimeError, "db went away"):
+                committer.submit(lambda: 1)
+            self.assertEqual(committer.submit(lambda: 2), 2)
+
+        # a flusher thread that is gone (here: stopped) is replaced on the next submit
+        committer.stop()
+        self.assertFalse(committer._thread.is_alive())
+        self.assertEqual(committer.submit(lambda: 3), 3)
+
+    def test_timeout_cancels_only_mutations_not_started(self):
+        import threading, time
+        from .group_commit import GroupCommitter, GroupCommitTimeout
+        committer = GroupCommitter(0.001, 1, timeout=0.1)
+        self.addCleanup(committer.stop)
+        slow = []
+        # the slow mutation is already running when its wait runs out: it gets its real result
+        runner = threading.Thread(target=lambda: slow.append(committer.submit(lambda: time.sleep(0.5) or "done")))
+        runner.start()
+        time.sleep(0.05)
+        # this one is still queued behind it when the wait runs out: cancelled, never run
+        ran = []
+        with self.assertRaises(GroupCommitTimeout):
+            committer.submit(ran.append, 1)
+        runner.join()
+        committer.stop()
+        self.assertEqual(slow, ["done"])
+        self.assertEqual(ran, [])
+
+
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        import tempfile
+        self.client = APIClient()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_signed_header_captures_profile_and_sql(self):
+        import json, os
+        from django.test import override_settings
+        from .profiling import HEADER, make_token
+        with override_settings(PROFILE_DIR=self.tmp.name):
+            self.client.post('/api/tasks/', {"title": "p"}, format='json', headers={HEADER: make_token()})
+            self.client.get('/api/tasks/', headers={HEADER: "forged"})
+        names = sorted(os.listdir(self.tmp.name))
+        self.assertEqual(len(names), 2)
+        self.assertTrue(names[1].endswith(".prof"))
+        with open(os.path.join(self.tmp.name, names[0])) as f:
+            meta = json.load(f)
+        self.assertEqual(meta["method"], "POST")
+        self.assertGreater(meta["sql_count"], 0)
+
+
+class PartitionedQueueTest(TestCase):
+    def test_partition_is_derived_on_save_and_bulk_create(self):
+        from .models import SyncQueueItem, partition_for_task
+        a, b = uuid.uuid4(), uuid.uuid4()
+        item = SyncQueueItem.objects.create(operation='create', task_id=a, task_snapshot={})
+        SyncQueueItem.objects.bulk_create([SyncQueueItem(operation='create', task_id=b, task_snapshot={})])
+        self.assertEqual(item.partition, partition_for_task(a))
+        self.assertEqual(SyncQueueItem.objects.get(task_id=b).partition, partition_for_task(b))
+
+    def test_rebalance_hands_over_partitions_without_overlap(self):
+        from . import partitions
+        first = partitions.drain_once("c1")
+        self.assertEqual(len(first["partitions"]), settings.SYNC_PARTITIONS)
+
+        # c2 joins: it wants half, but c1 still holds the leases until it rebalances
+        self.assertEqual(partitions.drain_once("c2")["partitions"], [])
+        c1 = partitions.drain_once("c1")["partitions"]
+        c2 = partitions.drain_once("c2")["partitions"]
+        self.assertFalse(set(c1) & set(c2))
+        self.assertEqual(sorted(c1 + c2), list(range(settings.SYNC_PARTITIONS)))
+
+        partitions.leave("c1")
+        self.assertEqual(len(partitions.drain_once("c2")["partitions"]), settings.SYNC_PARTITIONS)
+
+    def _ids_in_distinct_partitions(self):
+        from .models import partition_for_task
+        a = uuid.uuid4()
+        b = uuid.uuid4()
+        while partition_for_task(b) == partition_for_task(a):
+            b = uuid.uuid4()
+        return a, b
+
+    def _enqueue_update(self, tid, title):
+        from .models import SyncQueueItem
+        return SyncQueueItem.objects.create(operation='update', task_id=tid, task_snapshot={
+            "id": str(tid), "title": title, "updated_at": timezone.now().isoformat()})
+
+    def test_lost_lease_stops_processing_the_partition(self):
+        from django.test import override_settings
+        from . import partitions, services
+        from .models import SyncPartitionLease, partition_for_task
+        tid = uuid.uuid4()
+        p = partition_for_task(tid)
+        items = [self._enqueue_update(tid, "a"), self._enqueue_update(tid, "b")]
+        # TTL 0: the guard has to confirm the lease in the DB before every item
+        with override_settings(SYNC_CONSUMER_TTL=0):
+            self.assertEqual(partitions.acquire("c1", [p]), [p])
+            guard = partitions.LeaseGuard("c1", [p])
+            SyncPartitionLease.objects.filter(partition=p).update(owner="c2")
+            summary = services.process_sync_batch(items, before_item=guard.check)
+        self.assertEqual(summary["processed"], 0)
+        self.assertFalse(Task.objects.filter(id=tid).exists())
+
+    def test_api_sync_skips_partitions_held_by_a_consumer(self):
+        from . import partitions
+        from .models import SyncQueueItem, partition_for_task
+        held, free = self._ids_in_distinct_partitions()
+        self._enqueue_update(held, "held")
+        self._enqueue_update(free, "free")
+        partitions.acquire("c1", [partition_for_task(held)])
+
+        r = APIClient().post('/api/sync/', {}, format='json')
+        self.assertEqual(r.json()["synced_items"], 1)
+        self.assertEqual(SyncQueueItem.objects.get(task_id=held).status, "pending")
+        self.assertEqual(SyncQueueItem.objects.get(task_id=free).status, "done")
+        # the temporary leases of the API sync are given back
+        self.assertEqual(partitions.partition_depths()[partition_for_task(free)]["owner"], None)
+        self.assertEqual(partitions.partition_depths()[partition_for_task(held)]["owner"], "c1")
+
+    def test_consumer_publishes_queue_drained(self):
+        from unittest import mock
+        from . import partitions, notifications
+        self._enqueue_update(uuid.uuid4(), "a")
+        drained = mock.call(notifications.QUEUE_DRAINED)
+        with mock.patch.object(notifications, 'publish') as publish:
+            self.assertEqual(partitions.drain_once("c1")["processed"], 1)
+            self.assertEqual(publish.call_args_list.count(drained), 1)
+            # nothing processed: no event for an idle step
+            partitions.drain_once("c1")
+            self.assertEqual(publish.call_args_list.count(drained), 1)
+
+    def test_status_reports_partition_depth(self):
+        from .models import SyncQueueItem, partition_for_task
+        tid = uuid.uuid4()
+        SyncQueueItem.objects.create(operation='create', task_id=tid, task_snapshot={})
+        r = APIClient().get('/api/status/')
+        depths = {d["partition"]: d["pending"] for d in r.json()["partitions"]}
+        self.assertEqual(depths[partition_for_task(tid)], 1)
+        self.assertEqual(sum(depths.values()), 1)
+
+
+class VersionConflictTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_stale_save_raises_conflict(self):
+        from .models import VersionConflict
+        task = Task.objects.create(title="v")
+        stale = Task.objects.get(id=task.id)
+        task.title = "first"
+        task.save()
+        self.assertEqual(task.version, 2)
+        stale.title = "second"
+        with self.assertRaises(VersionConflict):
+            stale.save()
+        self.assertEqual(Task.objects.get(id=task.id).title, "first")
+
+    def test_put_with_stale_version_returns_409(self):
+        tid = self.client.post('/api/tasks/', {"title": "t"}, format='json').json()['id']
+        r = self.client.put(f'/api/tasks/{tid}/', {"title": "ok", "version": 1}, format='json')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["version"], 2)
+        r = self.client.put(f'/api/tasks/{tid}/', {"title": "late", "version": 1}, format='json')
+        self.assertEqual(r.status_code, 409)
+
+    def test_put_with_invalid_version_returns_400(self):
+        tid = self.client.post('/api/tasks/', {"title": "t"}, format='json').json()['id']
+        for version in ("abc", 0, -1):
+            r = self.client.put(f'/api/tasks/{tid}/', {"title": "x", "version": version}, format='json')
+            self.assertEqual(r.status_code, 400)
+            self.assertIn("version", r.json()["error"])
+        self.assertEqual(Task.objects.get(id=tid).version, 1)
+
+    def test_sync_of_own_writes_is_not_a_conflict(self):
+        from . import services
+        from .models import SyncQueueItem
+        tid = self.client.post('/api/tasks/', {"title": "a"}, format='json').json()['id']
+        self.client.put(f'/api/tasks/{tid}/', {"title": "b"}, format='json')
+        self.client.put(f'/api/tasks/{tid}/', {"title": "c"}, format='json')
+        items = list(SyncQueueItem.objects.filter(task_id=tid).order_by('created_at'))
+
+        summary = services.process_sync_batch(items)
+        self.assertEqual((summary["processed"], summary["conflicts"]), (3, 0))
+        # the row already holds the last write: syncing marks it synced without a new version
+        task = Task.objects.get(id=tid)
+        self.assertEqual((task.title, task.version, task.sync_status), ("c", 3, "synced"))
+        self.assertTrue(task.server_id.startswith("srv_"))
+        r = self.client.put(f'/api/tasks/{tid}/', {"title": "d", "version": 3}, format='json')
+        self.assertEqual(r.status_code, 200)
+
+    def test_each_item_costs_one_conditional_update(self):
+        from . import services
+        from .models import SyncQueueItem
+        tid = self.client.post('/api/tasks/', {"title": "a"}, format='json').json()['id']
+        self.client.put(f'/api/tasks/{tid}/', {"title": "b"}, format='json')
+        for item in SyncQueueItem.objects.filter(task_id=tid).order_by('created_at'):
+            snap = item.task_snapshot
+            # superseded (create) and confirmed (update) alike: one UPDATE, no SELECT
+            with self.assertNumQueries(1):
+                self.assertTrue(services._apply_queue_item(
+                    item.task_id, item.operation, snap, services._parse_datetime(snap["updated_at"])))
+        self.assertEqual(Task.objects.get(id=tid).version, 2)
+
+    def test_put_after_sync_keeps_client_version(self):
+        tid = self.client.post('/api/tasks/', {"title": "a"}, format='json').json()['id']
+        self.client.post('/api/sync/', {}, format='json')
+        r = self.client.put(f'/api/tasks/{tid}/', {"title": "b", "version": 1}, format='json')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["version"], 2)
+
+    def test_batch_create_and_update_sync_without_conflicts(self):
+        tid = str(uuid.uuid4())
+        r = self.client.post('/api/batch/', {"items": [
+            {"task_id": tid, "operation": "create", "data": {"title": "a"}},
+            {"task_id": tid, "operation": "update", "data": {"title": "b", "version": 1}},
+        ]}, format='json')
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(Task.objects.get(id=tid).version, 2)
+        r = self.client.post('/api/sync/', {}, format='json')
+        self.assertEqual(r.json()["conflicts"], 0)
+        self.assertEqual(Task.objects.get(id=tid).version, 2)
+
+    def test_sync_counts_interleaved_writer_as_conflict(self):
+        from . import services
+        from .models import SyncQueueItem
+        task = Task.objects.create(title="a")
+        Task.objects.filter(id=task.id).update(title="other", version=2)
+        # an item for v1 -> v2 whose write is not the one the row holds at v2
+        item = SyncQueueItem.objects.create(operation='update', task_id=task.id, task_snapshot={
+            "id": str(task.id), "title": "mine", "updated_at": "2025-01-01T00:00:00Z",
+            "base_version": 1, "version": 2})
+        summary = services.process_sync_batch([item])
+        self.assertEqual((summary["processed"], summary["conflicts"]), (1, 1))
+        self.assertEqual(Task.objects.get(id=task.id).title, "other")
+
+    def test_sync_inserts_task_missing_on_server(self):
+        from . import services
+        from .models import SyncQueueItem
+        tid = uuid.uuid4()
+        item = SyncQueueItem.objects.create(operation='update', task_id=tid, task_snapshot={
+            "id": str(tid), "title": "new", "updated_at": "2025-01-01T00:00:00Z", "base_version": 2, "version": 3})
+        summary = services.process_sync_batch([item])
+        self.assertEqual((summary["processed"], summary["conflicts"]), (1, 0))
+        task = Task.objects.get(id=tid)
+        self.assertEqual(task.updated_at.year, 2025)
+        self.assertEqual(task.version, 1)
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import HealthCheckView, TaskListCreateView, TaskDetailView, SyncTriggerView, SyncStatusView, BatchEndpointView
+from .views import HealthCheckView, TaskListCreateView, TaskDetailView, SyncTriggerView, SyncStatusView, BatchEndpointView, ChangesView, ChangeStreamView
 
 urlpatterns = [
     path('tasks/', TaskListCreateView.as_view(), name='tasks-list'),
@@ -7,6 +7,8 @@ urlpatterns = [
     path('sync/', SyncTriggerView.as_view(), name='sync-trigger'),
     path('status/', SyncStatusView.as_view(), name='sync-status'),
     path('batch/', BatchEndpointView.as_view(), name='batch-endpoint'),
+    path('changes/', ChangesView.as_view(), name='changes'),
+    path('changes/stream/', ChangeStreamView.as_view(), name='changes-stream'),
     path('health/', HealthCheckView.as_view(), name='health-check'),
 ]
 
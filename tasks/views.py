@@ -2,10 +2,17 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.utils.timezone import now
 from rest_framework import status
-from .models import SyncLog, Task, SyncQueueItem
-from .serializers import TaskSerializer, TaskCreateSerializer, SyncQueueItemSerializer
+from .models import SyncLog, Task, SyncQueueItem, VersionConflict
+from .serializers import TaskSerializer, TaskCreateSerializer, TaskUpdateSerializer, SyncQueueItemSerializer
 from . import services
+from . import notifications
+from . import group_commit
+from . import partitions
 from django.shortcuts import get_object_or_404
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+import json
 from django.conf import settings
 from django.utils import timezone
 
@@ -21,7 +28,10 @@ class TaskListCreateView(APIView):
         if serializer.is_valid():
             data = serializer.validated_data
             # create and enqueue
-            task = services.create_task(data)
+            try:
+                task = group_commit.run(services.create_task, data)
+            except group_commit.GroupCommitTimeout as ex:
+                return Response({"error": str(ex)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
             out = TaskSerializer(task).data
             return Response(out, status=status.HTTP_201_CREATED)
         return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
@@ -34,14 +44,27 @@ class TaskDetailView(APIView):
 
     def put(self, request, pk):
         task = get_object_or_404(Task, id=pk)
+        serializer = TaskUpdateSerializer(task, data=request.data, partial=True)
+        if not serializer.is_valid():
+            return Response({"error": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
         data = request.data
-        updated = services.update_task(pk, data)
+        try:
+            updated = group_commit.run(services.update_task, pk, data)
+        except VersionConflict as ex:
+            return Response({"error": str(ex)}, status=status.HTTP_409_CONFLICT)
+        except group_commit.GroupCommitTimeout as ex:
+            return Response({"error": str(ex)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         if not updated:
             return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(TaskSerializer(updated).data)
 
     def delete(self, request, pk):
-        ok = services.delete_task_soft(pk)
+        try:
+            ok = group_commit.run(services.delete_task_soft, pk)
+        except VersionConflict as ex:
+            return Response({"error": str(ex)}, status=status.HTTP_409_CONFLICT)
+        except group_commit.GroupCommitTimeout as ex:
+            return Response({"error": str(ex)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         if not ok:
             return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -55,12 +78,14 @@ class SyncTriggerView(APIView):
         batch_size = int(request.data.get('batch_size', settings.SYNC_BATCH_SIZE))
         total_processed = 0
         total_failed = 0
+        total_conflicts = 0
         errors = []
 
-        pending = SyncQueueItem.objects.filter(status='pending').order_by('created_at')[:batch_size]
-        summary = services.process_sync_batch(pending)
+        # only partitions no sync_consumer holds; see partitions.sync_unowned
+        summary = partitions.sync_unowned(batch_size)
         total_processed += summary.get('processed', 0)
         total_failed += summary.get('failed', 0)
+        total_conflicts += summary.get('conflicts', 0)
         errors.extend(summary.get('errors', []))
 
         # create a SyncLog entry for last sync
@@ -70,11 +95,14 @@ class SyncTriggerView(APIView):
             processed=total_processed, 
             failed=total_failed
         )
+        if services.pending_sync_count() == 0:
+            notifications.publish(notifications.QUEUE_DRAINED)
 
         return Response({
             "success": True,
             "synced_items": total_processed,
             "failed_items": total_failed,
+            "conflicts": total_conflicts,
             "errors": errors
         })
 
@@ -95,10 +123,95 @@ class SyncStatusView(APIView):
             "pending_sync_count": pending_sync_count,
             "last_sync_timestamp": last_sync_timestamp,
             "is_online": True,
-            "sync_queue_size": sync_queue_size
+            "sync_queue_size": sync_queue_size,
+            "consumers": partitions.live_consumers(),
+            "partitions": partitions.partition_depths()
         })
 
 
+def _longpoll_timeout(request):
+    limit = settings.NOTIFY_LONGPOLL_TIMEOUT
+    try:
+        return max(0.0, min(float(request.GET.get('timeout', limit)), limit))
+    except ValueError:
+        return limit
+
+
+class ChangesView(View):
+    """
+    GET /api/changes?since=<watermark>&timeout=<seconds>
+    Long-poll replacement for polling /api/status and /api/tasks.
+    Without `since` it returns the current watermark right away; with it, the request
+    is held until something newer happens (or the timeout passes, with no events).
+    An async view (DRF's APIView is sync only): under ASGI a waiting client holds no thread.
+    """
+    async def get(self, request):
+        notifications.ensure_listener()
+        since = request.GET.get('since')
+        if since is None:
+            return JsonResponse({"events": [], "watermark": notifications.hub.watermark})
+        try:
+            since = int(since)
+        except ValueError:
+            return JsonResponse({"error": "since must be an integer watermark"}, status=status.HTTP_400_BAD_REQUEST)
+
+        events = await notifications.hub.wait_async(since, _longpoll_timeout(request))
+        watermark = events[-1]["watermark"] if events else max(since, notifications.hub.watermark)
+        return JsonResponse({"events": events, "watermark": watermark})
+
+
+def _sse_frames(events):
+    for event in events:
+        yield f"id: {event['watermark']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+# comment line keeps proxies from closing an idle connection
+_SSE_KEEP_ALIVE = ": keep-alive\n\n"
+
+
+class ChangeStreamView(View):
+    """
+    GET /api/changes/stream
+    Server-sent events; each event id is its watermark, so EventSource resumes via Last-Event-ID.
+    A plain Django view: DRF content negotiation would reject Accept: text/event-stream.
+    Under ASGI the stream is an async generator waiting on the hub, so an idle client holds
+    no thread. Under WSGI it has to be a sync generator (Django would buffer an async one
+    to the end, which never comes), and each client then occupies a worker thread.
+    """
+    async def get(self, request):
+        notifications.ensure_listener()
+        try:
+            since = int(request.headers.get('Last-Event-ID') or request.GET.get('since', notifications.hub.watermark))
+        except ValueError:
+            since = notifications.hub.watermark
+        heartbeat = settings.NOTIFY_LONGPOLL_TIMEOUT
+
+        async def astream(since):
+            while True:
+                events = await notifications.hub.wait_async(since, heartbeat)
+                if not events:
+                    yield _SSE_KEEP_ALIVE
+                    continue
+                since = events[-1]["watermark"]
+                for frame in _sse_frames(events):
+                    yield frame
+
+        def stream(since):
+            while True:
+                events = notifications.hub.wait(since, heartbeat)
+                if not events:
+                    yield _SSE_KEEP_ALIVE
+                    continue
+                since = events[-1]["watermark"]
+                yield from _sse_frames(events)
+
+        content = astream(since) if isinstance(request, ASGIRequest) else stream(since)
+        response = StreamingHttpResponse(content, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
 class BatchEndpointView(APIView):
     """
     POST /api/batch